@@ -1,32 +1,89 @@
 import os
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
-MONGO_URL = os.getenv("DATABASE_URL") or os.getenv("MONGODB_URI") or "mongodb://localhost:27017"
-DB_NAME = os.getenv("DATABASE_NAME") or "dealwise"
+load_dotenv()
+
+MONGO_URL = os.getenv("DATABASE_URL") or os.getenv("MONGODB_URI")
+DB_NAME = os.getenv("DATABASE_NAME")
+# without both there is no database; endpoints answer "Database not configured"
+DB_CONFIGURED = bool(MONGO_URL and DB_NAME)
 
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
 
+class ObjectIdAsStr(TypeDecoder):
+    # decode _id (and any other ObjectId) straight to str so results are JSON-ready
+    bson_type = ObjectId
+
+    def transform_bson(self, value: ObjectId) -> str:
+        return str(value)
+
+CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([ObjectIdAsStr()]))
+
+def utcnow() -> datetime:
+    # timezone-aware UTC timestamp (datetime.utcnow is deprecated)
+    return datetime.now(timezone.utc)
+
 async def get_db() -> AsyncIOMotorDatabase:
     global _client, _db
+    if not DB_CONFIGURED:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     if _db is None:
-        _client = AsyncIOMotorClient(MONGO_URL)
-        _db = _client[DB_NAME]
+        # bounded pool with a few warm connections; fail fast when the DB is unreachable
+        _client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=50,
+            minPoolSize=5,
+            serverSelectionTimeoutMS=2000,
+            connectTimeoutMS=2000,
+            socketTimeoutMS=10000,
+            compressors="zstd,zlib",
+        )
+        _db = _client.get_database(DB_NAME, codec_options=CODEC_OPTIONS)
     return _db
 
-async def create_document(collection: str, data: Dict[str, Any]) -> str:
+async def ensure_indexes() -> None:
+    # back the /history, /listings and /favorites lookups; create_index is idempotent
     db = await get_db()
-    doc = {**data, "created_at": __import__("datetime").datetime.utcnow()}
-    res = await db[collection].insert_one(doc)
+    await db["pricehistory"].create_index([("merchant", 1), ("sku", 1), ("timestamp", -1)])
+    await db["listing"].create_index([("sku", 1), ("merchant", 1), ("fetched_at", -1)])
+    await db["favorite"].create_index([("user_id", 1), ("created_at", -1)])
+
+async def create_document(collection: str, data: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    """Insert `data` as-is: it is stamped with created_at/updated_at (and _id) in place."""
+    db = await get_db()
+    data["created_at"] = data["updated_at"] = now or utcnow()
+    res = await db[collection].insert_one(data)
     return str(res.inserted_id)
 
-async def get_documents(collection: str, filter_dict: Optional[Dict[str, Any]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+async def create_documents(collection: str, docs: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[str]:
+    if not docs:
+        return []
+    db = await get_db()
+    now = now or utcnow()
+    for d in docs:
+        d["created_at"] = d["updated_at"] = now
+    res = await db[collection].insert_many(docs, ordered=False)
+    return [str(x) for x in res.inserted_ids]
+
+async def get_documents(
+    collection: str,
+    filter_dict: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = 50,
+    projection: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[Tuple[str, int]]] = None,
+) -> List[Dict[str, Any]]:
     db = await get_db()
-    filter_dict = filter_dict or {}
-    cursor = db[collection].find(filter_dict).limit(limit)
-    docs = []
-    async for d in cursor:
-        d["_id"] = str(d["_id"])
-        docs.append(d)
-    return docs
+    cursor = db[collection].find(filter_dict or {}, projection=projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    # the cursor is already bounded; keep limit's 0 (= no limit) and negative
+    # (= single batch) semantics instead of passing it as to_list's length
+    return await cursor.to_list(length=None)
@@ -1,11 +1,27 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
+import functools
+import json
+import logging
 import os
-from database import create_document, get_documents
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from cachetools import TLRUCache
+import redis.asyncio as redis
 
-app = FastAPI(title="DealWise Backend", version="1.0.0")
+if __package__:  # imported as backend.main (top-level main.py)
+    from .database import DB_CONFIGURED, create_document, create_documents, ensure_indexes, get_db, get_documents, utcnow
+else:  # run from inside backend/ (uvicorn main:app), where backend/ is on sys.path
+    from database import DB_CONFIGURED, create_document, create_documents, ensure_indexes, get_db, get_documents, utcnow
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="DealWiseDe API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Open CORS for demo
 app.add_middleware(
@@ -16,139 +32,359 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def warmup_db():
+    # open the pool before the first request arrives
+    if not DB_CONFIGURED:
+        return
+    try:
+        db = await get_db()
+        await db.command("ping")
+    except Exception:
+        logger.warning("database warmup failed", exc_info=True)
+        return
+    # indexes are an optimization; never let them gate DB access
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("index creation failed")
+
 # Provider adapters (mock-friendly)
+class ProviderResult(BaseModel):
+    sku: str
+    title: str
+    image_url: Optional[str] = None
+    url: Optional[str] = None
+    merchant: str
+    price: float
+    currency: str = "INR"
+    rating: Optional[float] = None
+    total_reviews: Optional[int] = None
+    availability: Optional[str] = None
+
 AMAZON_KEYS_PRESENT = all([
     os.getenv("AMAZON_ACCESS_KEY"),
     os.getenv("AMAZON_SECRET_KEY"),
     os.getenv("AMAZON_PARTNER_TAG"),
 ])
+# Flipkart Affiliate API uses token
 FLIPKART_KEYS_PRESENT = all([
     os.getenv("FLIPKART_AFFILIATE_ID"),
     os.getenv("FLIPKART_AFFILIATE_TOKEN"),
 ])
 
+SEARCH_CACHE_TTL = 30
+
+# Recent /search results keyed by (query, providers, limit); a hit skips the
+# provider fan-out and the persistence writes. Entries are (results, ttl) so a
+# copy of a Redis hit only lives for that entry's remaining TTL.
+_search_cache: TLRUCache = TLRUCache(maxsize=1024, ttu=lambda _key, value, now: now + value[1])
+
+# Optional shared cache so all workers see the same hot /search entries; short
+# timeouts so a stalled Redis degrades to a cache miss instead of hanging /search
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TIMEOUT = 0.2
+_redis = (
+    redis.from_url(REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT)
+    if REDIS_URL
+    else None
+)
+
+async def redis_get(key: str) -> Tuple[Optional[Any], float]:
+    # returns the cached value and its remaining TTL in seconds
+    if _redis is None:
+        return None, 0.0
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            raw, pttl = await pipe.get(key).pttl(key).execute()
+    except Exception:
+        return None, 0.0
+    if raw is None:
+        return None, 0.0
+    return json.loads(raw), max(pttl, 0) / 1000
+
+async def redis_set(key: str, value: Any, ttl: int) -> None:
+    if _redis is None:
+        return
+    try:
+        await _redis.set(key, json.dumps(value), ex=ttl)
+    except Exception:
+        pass
+
+AMAZON_MOCK_IMAGE = "https://images.unsplash.com/photo-1517336714731-489689fd1ca8?q=80&w=600"
+FLIPKART_MOCK_IMAGE = "https://images.unsplash.com/photo-1516387938699-a93567ec168e?q=80&w=600"
+
 async def fetch_amazon(query: str, limit: int) -> List[Dict[str, Any]]:
     if not AMAZON_KEYS_PRESENT:
+        title = query.title()
         return [
             {
                 "sku": f"AMZ-{i}",
-                "title": f"Amazon mock item {i} for {query}",
-                "image_url": "https://via.placeholder.com/200x200.png?text=Amazon",
+                "title": f"{title} - Amazon Variant {i}",
+                "image_url": AMAZON_MOCK_IMAGE,
                 "url": "https://www.amazon.in/",
                 "merchant": "amazon",
-                "price": 999 + i * 10,
+                "price": round(999 + i * 50.5, 2),
                 "currency": "INR",
+                "rating": 4.2,
+                "total_reviews": 1200 + i * 15,
+                "availability": "In Stock",
             }
             for i in range(1, limit + 1)
         ]
-    # TODO: real Amazon integration when keys are provided
+    # TODO: real Amazon integration (PA-API v5 signed requests) when keys are provided
     return []
 
 async def fetch_flipkart(query: str, limit: int) -> List[Dict[str, Any]]:
     if not FLIPKART_KEYS_PRESENT:
+        title = query.title()
         return [
             {
                 "sku": f"FK-{i}",
-                "title": f"Flipkart mock item {i} for {query}",
-                "image_url": "https://via.placeholder.com/200x200.png?text=Flipkart",
+                "title": f"{title} - Flipkart Variant {i}",
+                "image_url": FLIPKART_MOCK_IMAGE,
                 "url": "https://www.flipkart.com/",
                 "merchant": "flipkart",
-                "price": 899 + i * 12,
+                "price": round(979 + i * 48.3, 2),
                 "currency": "INR",
+                "rating": 4.1,
+                "total_reviews": 900 + i * 25,
+                "availability": "In Stock",
             }
             for i in range(1, limit + 1)
         ]
     # TODO: real Flipkart integration when keys are provided
     return []
 
+DEFAULT_PROVIDERS: Tuple[str, ...] = ("amazon", "flipkart")
+
+@functools.lru_cache(maxsize=32)
+def parse_providers(providers: Optional[str]) -> Tuple[str, ...]:
+    # the ?providers= values seen in practice are few, so memoize the parse
+    if not providers:
+        return DEFAULT_PROVIDERS
+    return tuple(p.strip().lower() for p in providers.split(",") if p.strip())
+
+# API schemas
+class SearchResponse(BaseModel):
+    query: str
+    providers: List[str]
+    results: List[ProviderResult]
+
+class FavoriteIn(BaseModel):
+    user_id: str
+    sku: str
+    title: str
+    image_url: Optional[str] = None
+    url: Optional[str] = None
+    merchant: str
+    price: float
+    currency: str = "INR"
+
+    def insert_dict(self) -> Dict[str, Any]:
+        # fields map 1:1 onto the favorite doc, so skip model_dump()'s generic serializer
+        return {
+            "user_id": self.user_id,
+            "sku": self.sku,
+            "title": self.title,
+            "image_url": self.image_url,
+            "url": self.url,
+            "merchant": self.merchant,
+            "price": self.price,
+            "currency": self.currency,
+        }
+
 @app.get("/")
 async def root():
-    return {"ok": True, "service": "DealWise Backend"}
+    return {"message": "DealWiseDe backend running"}
+
+HEALTH_CACHE_TTL = 5
+
+# last /test result so frequent polling doesn't hit the DB every time
+_health_cache: Dict[str, Any] = {"t": 0.0, "v": None}
 
 @app.get("/test")
 async def test():
-    # simple DB test
+    if _health_cache["v"] is not None and time.monotonic() - _health_cache["t"] < HEALTH_CACHE_TTL:
+        return _health_cache["v"]
+    response = {
+        "backend": "✅ Running",
+        "database": "❌ Not Available",
+        "database_url": None,
+        "database_name": None,
+        "connection_status": "Not Connected",
+        "collections": [],
+    }
     try:
-        docs = await get_documents("health", {}, limit=1)
-        return {"ok": True, "db": True, "docs": docs}
+        if DB_CONFIGURED:
+            db = await get_db()
+            response["database"] = "✅ Available"
+            response["database_name"] = db.name
+            response["connection_status"] = "Connected"
+            try:
+                collections = await db.list_collection_names()
+                response["collections"] = collections[:10]
+                response["database"] = "✅ Connected & Working"
+            except Exception as e:
+                response["database"] = f"⚠️ Connected but Error: {str(e)[:50]}"
     except Exception as e:
-        return {"ok": True, "db": False, "error": str(e)}
+        response["database"] = f"❌ Error: {str(e)[:50]}"
+
+    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+    _health_cache["t"] = time.monotonic()
+    _health_cache["v"] = response
+    return response
 
 @app.get("/providers")
 async def providers():
     return {
-        "providers": [
-            {"name": "amazon", "enabled": AMAZON_KEYS_PRESENT},
-            {"name": "flipkart", "enabled": FLIPKART_KEYS_PRESENT},
-        ]
+        "amazon": {"configured": AMAZON_KEYS_PRESENT},
+        "flipkart": {"configured": FLIPKART_KEYS_PRESENT},
     }
 
-@app.get("/search")
-async def search(query: str = Query(...), limit: int = 10, providers: Optional[str] = None):
-    prov_list = [p.strip().lower() for p in providers.split(",")] if providers else ["amazon", "flipkart"]
-    results: List[Dict[str, Any]] = []
-    if "amazon" in prov_list:
-        results.extend(await fetch_amazon(query, limit))
-    if "flipkart" in prov_list:
-        results.extend(await fetch_flipkart(query, limit))
-
-    # persist query and listings
-    await create_document("searchquery", {"query": query, "providers": prov_list, "limit": limit})
-    for r in results:
-        await create_document("listings", r)
-        await create_document("pricehistory", {
+async def persist_search(query: str, prov_list: Tuple[str, ...], limit: int, results: List[Dict[str, Any]]) -> None:
+    # persist query, listings and price history, all stamped with the same time
+    if not DB_CONFIGURED:
+        return
+    now = utcnow()
+    listing_docs = [{**r, "fetched_at": now} for r in results]
+    price_docs = [
+        {
             "sku": r["sku"],
             "merchant": r["merchant"],
             "price": r["price"],
             "currency": r.get("currency", "INR"),
-        })
+            "timestamp": now,
+        }
+        for r in results
+    ]
+    # each write is independent; log failures rather than dropping the rest
+    try:
+        await create_documents("listing", listing_docs, now)
+    except Exception:
+        logger.exception("failed to persist listings for query %r", query)
+    try:
+        await create_documents("pricehistory", price_docs, now)
+    except Exception:
+        logger.exception("failed to persist price history for query %r", query)
+    try:
+        await create_document("searchquery", {"query": query, "providers": list(prov_list), "limit": limit}, now)
+    except Exception:
+        logger.exception("failed to persist search query %r", query)
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    background: BackgroundTasks,
+    query: str = Query(...),
+    limit: int = 5,
+    providers: Optional[str] = None,
+):
+    prov_list = parse_providers(providers)
+    cache_key = (query.lower(), prov_list, limit)
+    entry = _search_cache.get(cache_key)
+    if entry is not None:
+        return {"query": query, "providers": prov_list, "results": entry[0]}
+    redis_key = "search:" + json.dumps(cache_key)
+    cached, remaining = await redis_get(redis_key)
+    if cached is not None:
+        if remaining > 0:
+            _search_cache[cache_key] = (cached, remaining)
+        return {"query": query, "providers": prov_list, "results": cached}
+
+    # fan out to providers concurrently; task order keeps amazon before flipkart
+    names: List[str] = []
+    tasks = []
+    if "amazon" in prov_list:
+        names.append("amazon")
+        tasks.append(fetch_amazon(query, limit))
+    if "flipkart" in prov_list:
+        names.append("flipkart")
+        tasks.append(fetch_flipkart(query, limit))
+    # plain dicts throughout; response_model validates them once on the way out
+    results: List[Dict[str, Any]] = []
+    partial = False
+    gathered = await asyncio.gather(*tasks, return_exceptions=True)
+    for name, provider_results in zip(names, gathered):
+        if isinstance(provider_results, BaseException):
+            logger.error("provider %s failed for query %r", name, query, exc_info=provider_results)
+            partial = True
+            continue
+        results.extend(provider_results)
 
-    return {"results": results}
+    # a partial result is served but neither cached nor recorded as listings/price history
+    if partial:
+        background.add_task(persist_search, query, prov_list, limit, [])
+        return {"query": query, "providers": prov_list, "results": results}
+
+    # history/analytics writes and the shared-cache fill run after the response is sent
+    background.add_task(persist_search, query, prov_list, limit, results)
+    background.add_task(redis_set, redis_key, results, SEARCH_CACHE_TTL)
+
+    _search_cache[cache_key] = (results, SEARCH_CACHE_TTL)
+    return {"query": query, "providers": prov_list, "results": results}
+
+LISTING_PROJECTION = {
+    "sku": 1,
+    "title": 1,
+    "image_url": 1,
+    "url": 1,
+    "merchant": 1,
+    "price": 1,
+    "currency": 1,
+    "rating": 1,
+    "total_reviews": 1,
+    "availability": 1,
+    "fetched_at": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+def require_db() -> None:
+    if not DB_CONFIGURED:
+        raise HTTPException(status_code=500, detail="Database not configured")
 
 @app.get("/listings")
 async def get_listings(sku: Optional[str] = None, merchant: Optional[str] = None, limit: int = 50):
+    require_db()
     filt: Dict[str, Any] = {}
     if sku:
         filt["sku"] = sku
     if merchant:
         filt["merchant"] = merchant
-    docs = await get_documents("listings", filt, limit)
+    docs = await get_documents("listing", filt, limit, projection=LISTING_PROJECTION, sort=[("fetched_at", -1)])
     return docs
 
 @app.get("/history/{merchant}/{sku}")
-async def history(merchant: str, sku: str, limit: int = 100):
-    docs = await get_documents("pricehistory", {"merchant": merchant, "sku": sku}, limit)
+async def history(merchant: str, sku: str, limit: int = 50):
+    require_db()
+    docs = await get_documents(
+        "pricehistory", {"merchant": merchant, "sku": sku}, limit, sort=[("timestamp", -1)]
+    )
     return docs
 
-class FavoriteIn(BaseModel):
-    user_id: str
-    sku: str
-    title: str
-    image_url: Optional[str] = None
-    url: Optional[str] = None
-    merchant: str
-    price: float
-    currency: str = "INR"
-
 @app.post("/favorites")
 async def add_favorite(fav: FavoriteIn):
-    fav_id = await create_document("favorite", fav.model_dump())
-    return {"ok": True, "id": fav_id}
+    try:
+        fav_id = await create_document("favorite", fav.insert_dict())
+        return {"ok": True, "id": fav_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/favorites")
 async def list_favorites(user_id: str):
-    docs = await get_documents("favorite", {"user_id": user_id}, 200)
+    require_db()
+    docs = await get_documents("favorite", {"user_id": user_id}, None, sort=[("created_at", -1)])
     return docs
 
 @app.delete("/favorites/{fav_id}")
 async def delete_favorite(fav_id: str):
-    from bson import ObjectId
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    client = AsyncIOMotorClient(os.getenv("DATABASE_URL", "mongodb://localhost:27017"))
-    db = client[os.getenv("DATABASE_NAME", "dealwise")]
+    require_db()
     try:
-        res = await db["favorite"].delete_one({"_id": ObjectId(fav_id)})
-        return {"ok": True, "deleted": res.deleted_count}
-    except Exception as e:
+        oid = ObjectId(fav_id)
+    except (InvalidId, TypeError) as e:
         raise HTTPException(status_code=400, detail=str(e))
+    # only a bad id is the client's fault; DB errors surface as server errors
+    db = await get_db()
+    res = await db["favorite"].delete_one({"_id": oid})
+    return {"ok": res.deleted_count == 1}